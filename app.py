@@ -1,11 +1,19 @@
 import streamlit as st
 import pandas as pd
 import requests
-import json
+import html
+import logging
+import os
 import io
 import re
+import threading
+from collections import OrderedDict
 from difflib import SequenceMatcher
 
+from model_store import ModelStore
+from movie_parsing import clean_text, extract_cast_names, extract_director, extract_genre_names
+from poster_fetcher import PosterFetcher, PosterCache, PLACEHOLDER_POSTER
+
 try:
     from sklearn.feature_extraction.text import TfidfVectorizer
     from sklearn.metrics.pairwise import cosine_similarity
@@ -199,6 +207,12 @@ header {visibility: hidden;}
     transform: translateY(-2px);
 }
 
+.movie-card-poster {
+    float: left;
+    margin: 0 1.5rem 1rem 0;
+    border-radius: 8px;
+}
+
 .movie-title {
     font-size: 1.5rem;
     font-weight: 600;
@@ -288,6 +302,8 @@ header {visibility: hidden;}
 </style>
 """, unsafe_allow_html=True)
 
+logger = logging.getLogger(__name__)
+
 # TMDB API key
 try:
     TMDB_API_KEY = st.secrets["TMDB_API_KEY"]
@@ -298,14 +314,48 @@ except:
 GITHUB_REPO_URL = "https://raw.githubusercontent.com/vengeanceI/movie-recommender/main/"
 MOVIES_FILE = "tmdb_5000_movies.csv"
 CREDITS_FILE = "tmdb_credits_maximum.csv"
+# Directory written by catalog_ingest.py; when set the app serves the prebuilt out-of-core index
+CATALOG_INDEX_DIR = os.environ.get("CINEMA_VAULT_INDEX_DIR")
+# Root written by model_store.py; workers attach to its CURRENT version instead of loading their own copy
+MODEL_STORE_DIR = os.environ.get("CINEMA_VAULT_MODEL_DIR")
+# Display records kept per process; the working set is a few pages of cards, not the catalog
+DISPLAY_RECORD_CACHE_SIZE = 5000
+POSTER_CACHE_PATH = os.environ.get("CINEMA_VAULT_POSTER_CACHE", ".cache/posters.sqlite3")
+# Posters are fetched on the render thread, so keep a slow TMDB from stalling the page
+POSTER_FETCH_TIMEOUT = (2, 3)
+POSTER_FETCH_RETRIES = 1
+# A 429's Retry-After is never slept out in full on the render thread; the breaker skips instead
+POSTER_FETCH_MAX_RETRY_AFTER = 1
+
+@st.cache_resource
+def load_catalog_index():
+    if not CATALOG_INDEX_DIR:
+        return None
+    try:
+        # Imported here so plain deployments do not depend on the ingestion module
+        from catalog_ingest import CatalogIndex
+        return CatalogIndex(CATALOG_INDEX_DIR)
+    except Exception:
+        logger.exception("Could not open the catalog index in %s; falling back to a per-process copy", CATALOG_INDEX_DIR)
+        return None
+
+@st.cache_resource
+def get_model_store():
+    if not MODEL_STORE_DIR:
+        return None
+    return ModelStore(MODEL_STORE_DIR)
 
-def clean_text(text):
-    if pd.isna(text) or text == '':
-        return ''
-    text = str(text)
-    text = re.sub(r'<[^>]+>', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+def load_shared_model():
+    # Not cached per process: the store swaps to a newly published version on its own
+    store = get_model_store()
+    if store is None:
+        return None
+    try:
+        # None until a version is published; the store logs that once rather than on every rerun
+        return store.current()
+    except Exception:
+        logger.exception("Could not attach to the shared model in %s; falling back to a per-process copy", MODEL_STORE_DIR)
+        return None
 
 @st.cache_data
 def load_data():
@@ -329,13 +379,27 @@ def load_data():
             pass
         
         movies_df = process_movie_data(movies_df)
-        return movies_df
+        return stamp_model_version(movies_df)
         
     except Exception as e:
-        return create_sample_data()
+        return stamp_model_version(create_sample_data())
+
+def stamp_model_version(movies_df):
+    # Keys the display caches; attrs survive st.cache_data's pickling
+    hashed = pd.util.hash_pandas_object(movies_df[['id', 'title']], index=False)
+    movies_df.attrs['model_version'] = f"{len(movies_df)}-{int(hashed.sum()) & 0xffffffffffff:x}"
+    return movies_df
+
+def get_model_version(movies_df):
+    return movies_df.attrs.get('model_version', 'default')
 
 def process_movie_data(movies_df):
     try:
+        # The repo's credits export names its columns cast_data/crew_data
+        for source, target in (('cast_data', 'cast'), ('crew_data', 'crew')):
+            if source in movies_df.columns and target not in movies_df.columns:
+                movies_df = movies_df.rename(columns={source: target})
+        
         essential_cols = ['id', 'title', 'overview', 'genres', 'vote_average', 'vote_count', 
                          'popularity', 'release_date', 'runtime']
         optional_cols = ['cast', 'crew', 'keywords']
@@ -345,51 +409,13 @@ def process_movie_data(movies_df):
         movies_df = movies_df.dropna(subset=['title', 'overview'])
         movies_df = movies_df[movies_df['overview'].str.len() > 10]
         
-        def extract_genre_names(text):
-            try:
-                if pd.isna(text) or text == '':
-                    return 'Unknown'
-                data = json.loads(text.replace("'", '"'))
-                if isinstance(data, list):
-                    return ' '.join([item['name'] for item in data[:3] if 'name' in item])
-                return clean_text(text)
-            except:
-                return clean_text(text) if pd.notna(text) else 'Unknown'
-        
         movies_df['genres'] = movies_df['genres'].fillna('[]').apply(extract_genre_names)
         
         if 'cast' in movies_df.columns:
-            def extract_cast_names(text):
-                try:
-                    if pd.isna(text) or text == '':
-                        return ''
-                    data = json.loads(text.replace("'", '"'))
-                    if isinstance(data, list):
-                        cast_names = [actor['name'] for actor in data[:10] if 'name' in actor]
-                        return ' | '.join(cast_names)
-                    return clean_text(text)
-                except:
-                    return clean_text(text) if pd.notna(text) else ''
-            
             movies_df['cast'] = movies_df['cast'].fillna('[]').apply(extract_cast_names)
             movies_df['cast_searchable'] = movies_df['cast'].str.lower().str.replace('|', ' ')
         
         if 'crew' in movies_df.columns:
-            def extract_director(text):
-                try:
-                    if pd.isna(text) or text == '':
-                        return ''
-                    data = json.loads(text.replace("'", '"'))
-                    if isinstance(data, list):
-                        directors = []
-                        for person in data:
-                            if person.get('job') == 'Director':
-                                directors.append(person['name'])
-                        return ' | '.join(directors[:3])
-                    return ''
-                except:
-                    return ''
-            
             movies_df['director'] = movies_df['crew'].apply(extract_director)
             movies_df['director_searchable'] = movies_df['director'].str.lower().str.replace('|', ' ')
         
@@ -447,38 +473,225 @@ def create_similarity_matrix(movies_df):
             max_df=0.8
         )
         
-        vectors = tfidf.fit_transform(movies_df['combined_features']).toarray()
+        vectors = tfidf.fit_transform(movies_df['combined_features'])
         similarity = cosine_similarity(vectors)
         return similarity
         
     except Exception as e:
         return None
 
-def get_movie_poster(movie_title, tmdb_id=None):
-    return "https://via.placeholder.com/300x450/1f1f1f/ffffff?text=🎬+Movie"
+@st.cache_resource
+def get_poster_fetcher():
+    if not TMDB_API_KEY:
+        return None
+    return PosterFetcher(
+        TMDB_API_KEY,
+        cache=PosterCache(POSTER_CACHE_PATH),
+        timeout=POSTER_FETCH_TIMEOUT,
+        retries=POSTER_FETCH_RETRIES,
+        backoff_factor=0.2,
+        max_retry_after=POSTER_FETCH_MAX_RETRY_AFTER,
+    )
+
+def get_movie_posters(movies_df):
+    # One batched lookup for every card on the page
+    if movies_df is None or len(movies_df) == 0:
+        return []
+    fetcher = get_poster_fetcher()
+    if fetcher is None:
+        return [PLACEHOLDER_POSTER] * len(movies_df)
+    ids = movies_df['id'] if 'id' in movies_df.columns else [None] * len(movies_df)
+    try:
+        return fetcher.poster_urls(zip(ids, movies_df['title']))
+    except Exception:
+        return [PLACEHOLDER_POSTER] * len(movies_df)
+
+def _text_column(movies, column, default=''):
+    if column not in movies.columns:
+        return pd.Series(default, index=movies.index)
+    return movies[column].fillna(default).astype(str)
+
+def _escaped_column(movies, column, default=''):
+    return _text_column(movies, column, default).map(html.escape)
+
+def build_display_records(movies):
+    # Everything a card or selector needs, formatted once per movie with column operations
+    records = pd.DataFrame(index=movies.index)
+    records['id'] = movies['id']
+    
+    year = _text_column(movies, 'release_date').str[:4]
+    records['year'] = year
+    year_suffix = (' (' + year + ')').where(year != '', '')
+    
+    runtime = pd.to_numeric(movies['runtime'], errors='coerce') if 'runtime' in movies.columns else pd.Series(float('nan'), index=movies.index)
+    runtime = runtime.where(runtime > 0)
+    hours = (runtime // 60).fillna(0).astype(int)
+    minutes = (runtime % 60).fillna(0).astype(int)
+    records['runtime_text'] = ('⏱️ ' + hours.astype(str) + 'h ' + minutes.astype(str) + 'min').where(hours > 0, '⏱️ ' + minutes.astype(str) + 'min').where(runtime.notna(), '')
+    
+    rating = pd.to_numeric(movies['vote_average'], errors='coerce').fillna(0).map('{:.1f}'.format).astype(str)
+    records['rating'] = rating
+    records['option_label'] = _text_column(movies, 'title') + year_suffix + ' - ⭐' + rating
+    
+    title = _escaped_column(movies, 'title')
+    genres = _escaped_column(movies, 'genres')
+    overview = _escaped_column(movies, 'overview')
+    director = _escaped_column(movies, 'director')
+    director_display = ('🎬 ' + director).where(director != '', '')
+    release_display = ('📅 ' + year).where(year != '', '')
+    cast = _escaped_column(movies, 'cast')
+    cast_display = ('<div class="movie-meta"><span>Cast: ' + cast + '</span></div>').where(cast != '', '')
+    
+    records['title_html'] = title
+    records['info_html'] = (
+        '<div class="movie-info-content">'
+        '<h2 class="movie-info-title">' + title + '</h2>'
+        '<div class="movie-info-meta">'
+        '<span class="movie-rating">⭐ ' + rating + '/10</span>'
+        '<span class="movie-genre">🎭 ' + genres + '</span>'
+        '<span>' + director_display + '</span>'
+        '<span>' + release_display + '</span>'
+        '<span>' + records['runtime_text'] + '</span>'
+        '</div>'
+        '<div class="movie-info-plot"><strong>Plot:</strong> ' + overview + '</div>'
+        + cast_display +
+        '</div>'
+    )
+    records['card_html'] = (
+        '<div class="movie-title">' + title + '</div>'
+        '<span class="movie-rating">⭐ ' + rating + '</span>'
+        '<span class="movie-genre">' + genres + '</span>'
+        '<div class="movie-description">' + overview + '</div>'
+        '<div class="movie-meta">'
+        '<span>' + director_display + '</span>'
+        '<span>' + release_display + '</span>'
+        '<span>' + records['runtime_text'] + '</span>'
+        '</div>'
+    )
+    records = records.set_index('id', drop=False)
+    return records[~records.index.duplicated()]
+
+class DisplayRecordCache:
+    """Bounded LRU of display records by movie id, shared by every session in the process.
+
+    Misses are built together in one vectorized batch; a new model version empties the cache.
+    """
+
+    def __init__(self, max_records=DISPLAY_RECORD_CACHE_SIZE):
+        self.max_records = max_records
+        self._version = None
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, movies, model_version):
+        ids = movies['id'].tolist()
+        found = {}
+        with self._lock:
+            if model_version != self._version:
+                self._version = model_version
+                self._records.clear()
+            for movie_id in ids:
+                record = self._records.get(movie_id)
+                if record is not None:
+                    self._records.move_to_end(movie_id)
+                    found[movie_id] = record
+        
+        missing = movies[~movies['id'].isin(list(found))]
+        if len(missing) > 0:
+            # Formatting happens outside the lock; only the insert is serialised
+            built = build_display_records(missing).to_dict('index')
+            found.update(built)
+            with self._lock:
+                if model_version == self._version:
+                    self._records.update(built)
+                    while len(self._records) > self.max_records:
+                        self._records.popitem(last=False)
+        
+        return pd.DataFrame([found[movie_id] for movie_id in ids], index=ids)
+
+@st.cache_resource
+def get_display_record_cache():
+    return DisplayRecordCache()
+
+def get_display_records(movies, model_version):
+    return get_display_record_cache().get(movies, model_version)
+
+# One entry per model version; only the current one and the one being swapped out are useful
+@st.cache_data(max_entries=2)
+def get_popular_movies(_movies, model_version, n=15):
+    # _movies is a DataFrame, SharedModel or CatalogIndex; all provide nlargest
+    return _movies.nlargest(n, 'popularity')
+
+def render_selected_movie(record, poster_url):
+    return (
+        '<div class="selected-movie-info">'
+        '<div class="movie-poster">'
+        f'<img src="{html.escape(poster_url)}" width="200" alt="{record["title_html"]}">'
+        '</div>'
+        f'{record["info_html"]}'
+        '</div>'
+    )
+
+def render_recommendation_card(record, similarity, poster_url):
+    return (
+        '<div class="movie-card">'
+        f'<div class="match-score">{similarity * 100:.0f}% Match</div>'
+        f'<img class="movie-card-poster" src="{html.escape(poster_url)}" width="120" alt="{record["title_html"]}">'
+        f'{record["card_html"]}'
+        '</div>'
+    )
 
 def similarity_score(a, b):
     return SequenceMatcher(None, a.lower(), b.lower()).ratio()
 
-def search_movies(movies_df, query):
-    if not query or len(query.strip()) < 2:
-        return pd.DataFrame(), "auto", ""
-    
-    query = query.lower().strip()
-    results = []
-    
-    # Detect search type
+def detect_search_type(query):
     actors = ['brad pitt', 'leonardo dicaprio', 'christopher nolan', 'martin scorsese']
     directors = ['christopher nolan', 'martin scorsese', 'quentin tarantino', 'steven spielberg']
     genres = ['action', 'adventure', 'comedy', 'drama', 'horror', 'thriller']
     
-    search_type = "title"
     if any(actor in query for actor in actors):
-        search_type = "actor"
+        return "actor"
     elif any(director in query for director in directors):
-        search_type = "director"
+        return "director"
     elif any(genre in query for genre in genres):
-        search_type = "genre"
+        return "genre"
+    return "title"
+
+def search_catalog_model(model, query):
+    # Same scoring as search_movies, answered from a SharedModel's or CatalogIndex's search indexes
+    if not query or len(query.strip()) < 2:
+        return pd.DataFrame(), "auto", ""
+    
+    query = query.lower().strip()
+    search_type = detect_search_type(query)
+    
+    exact_rows = set(model.search('title_search', query, exact=True))
+    results = [(row, 100) for row in exact_rows]
+    results += [(row, 85) for row in model.search('title_search', query) if row not in exact_rows]
+    results += [(row, 80) for row in model.search('cast_search', query)]
+    results += [(row, 85) for row in model.search('director_search', query)]
+    results += [(row, 70) for row in model.search('genres_search', query)]
+    
+    if not results:
+        return pd.DataFrame(), search_type, f"No results found for '{query}'"
+    
+    best = {}
+    for row, score in results:
+        if row not in best:
+            best[row] = score
+    ranked = sorted(best.items(), key=lambda x: x[1], reverse=True)[:30]
+    
+    result_df = model.frame([row for row, _ in ranked])
+    return result_df.reset_index(drop=True), search_type, ""
+
+def search_movies(movies_df, query):
+    if not query or len(query.strip()) < 2:
+        return pd.DataFrame(), "auto", ""
+    
+    query = query.lower().strip()
+    results = []
+    
+    search_type = detect_search_type(query)
 
     # Title search
     exact_matches = movies_df[movies_df['title'].str.lower() == query]
@@ -537,6 +750,18 @@ def search_movies(movies_df, query):
     result_df = pd.DataFrame([movie for movie, _, _ in unique_results[:30]])
     return result_df.reset_index(drop=True), search_type, ""
 
+def recommend_catalog_model(movie_title, model, n_recommendations=6):
+    try:
+        rows = model.search('title_search', movie_title.lower(), exact=True)
+        if not rows:
+            return pd.DataFrame()
+        movie_indices, scores = model.similar(rows[0], n_recommendations)
+        recommendations = model.frame(movie_indices)
+        recommendations['similarity_score'] = scores
+        return recommendations
+    except Exception as e:
+        return pd.DataFrame()
+
 def recommend_movies(movie_title, movies_df, similarity_matrix, n_recommendations=6):
     try:
         if similarity_matrix is None:
@@ -600,13 +825,27 @@ def main():
     """, unsafe_allow_html=True)
 
     # Load data
-    movies_df = load_data()
+    # A shared model or prebuilt catalog index is read row by row; otherwise load the whole catalog
+    catalog_model = load_shared_model()
+    if catalog_model is None:
+        catalog_model = load_catalog_index()
+    movies_df = None
+    similarity_matrix = None
     
-    if movies_df is None or len(movies_df) == 0:
+    if catalog_model is not None:
+        catalog_size = len(catalog_model)
+        model_version = catalog_model.version
+    else:
+        movies_df = load_data()
+        catalog_size = 0 if movies_df is None else len(movies_df)
+    
+    if catalog_size == 0:
         st.error("Could not load movie data.")
         return
     
-    similarity_matrix = create_similarity_matrix(movies_df)
+    if catalog_model is None:
+        similarity_matrix = create_similarity_matrix(movies_df)
+        model_version = get_model_version(movies_df)
 
     # Hero section
     st.markdown("""
@@ -629,7 +868,10 @@ def main():
         selected_movie = None
         
         if search_query:
-            search_results, search_type, error_message = search_movies(movies_df, search_query)
+            if catalog_model is not None:
+                search_results, search_type, error_message = search_catalog_model(catalog_model, search_query)
+            else:
+                search_results, search_type, error_message = search_movies(movies_df, search_query)
             
             if not error_message and len(search_results) > 0:
                 if search_type == "actor":
@@ -639,107 +881,57 @@ def main():
                 elif search_type == "genre":
                     st.write(f"🎭 Genre: {search_query.title()}")
                 
-                result_options = []
-                for _, movie in search_results.head(20).iterrows():
-                    year = ""
-                    if 'release_date' in movie and pd.notna(movie['release_date']):
-                        try:
-                            year = f" ({movie['release_date'][:4]})"
-                        except:
-                            year = ""
-                    
-                    display_text = f"{movie['title']}{year} - ⭐{movie['vote_average']:.1f}"
-                    result_options.append(display_text)
+                result_movies = search_results.head(20)
+                result_records = get_display_records(result_movies, model_version)
+                option_labels = dict(zip(result_records['id'].tolist(), result_records['option_label']))
                 
-                selected_display = st.selectbox(
+                selected_id = st.selectbox(
                     f"Choose from {len(search_results)} results:", 
-                    result_options
+                    list(option_labels),
+                    format_func=option_labels.get
                 )
                 
-                if selected_display:
-                    selected_movie_title = selected_display.split(" - ⭐")[0]
-                    if " (" in selected_movie_title:
-                        selected_movie_title = selected_movie_title.rsplit(" (", 1)[0]
-                    
-                    for _, movie in search_results.iterrows():
-                        if movie['title'] == selected_movie_title:
-                            selected_movie = movie
-                            break
+                if selected_id is not None:
+                    selected_movie = result_movies[result_movies['id'] == selected_id].iloc[0]
             
             elif error_message:
                 st.warning(error_message)
         
         if not search_query:
-            popular_movies = movies_df.nlargest(15, 'popularity')
-            
-            movie_options = []
-            for _, movie in popular_movies.iterrows():
-                year = ""
-                if 'release_date' in movie and pd.notna(movie['release_date']):
-                    try:
-                        year = f" ({movie['release_date'][:4]})"
-                    except:
-                        year = ""
-                display_text = f"{movie['title']}{year} - ⭐{movie['vote_average']:.1f}"
-                movie_options.append(display_text)
+            popular_movies = get_popular_movies(catalog_model if catalog_model is not None else movies_df, model_version)
+            popular_records = get_display_records(popular_movies, model_version)
+            option_labels = dict(zip(popular_records['id'].tolist(), popular_records['option_label']))
             
-            selected_display = st.selectbox("Choose from popular movies:", movie_options)
+            selected_id = st.selectbox("Choose from popular movies:", list(option_labels), format_func=option_labels.get)
             
-            if selected_display:
-                selected_movie_title = selected_display.split(" - ⭐")[0]
-                if " (" in selected_movie_title:
-                    selected_movie_title = selected_movie_title.rsplit(" (", 1)[0]
-                
-                for _, movie in popular_movies.iterrows():
-                    if movie['title'] == selected_movie_title:
-                        selected_movie = movie
-                        break
+            if selected_id is not None:
+                selected_movie = popular_movies[popular_movies['id'] == selected_id].iloc[0]
         
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
         if selected_movie is not None:
-            poster_url = get_movie_poster(selected_movie['title'])
-            
-            runtime_info = ""
-            if 'runtime' in selected_movie and pd.notna(selected_movie['runtime']) and selected_movie['runtime'] > 0:
-                hours = int(selected_movie['runtime']) // 60
-                minutes = int(selected_movie['runtime']) % 60
-                if hours > 0:
-                    runtime_info = f"⏱️ {hours}h {minutes}min"
-                else:
-                    runtime_info = f"⏱️ {minutes}min"
-            
-            release_info = ""
-            if 'release_date' in selected_movie and pd.notna(selected_movie['release_date']):
-                try:
-                    release_info = f"📅 {selected_movie['release_date'][:4]}"
-                except:
-                    release_info = ""
-            
-            cast_display = ""
-            if 'cast' in selected_movie and pd.notna(selected_movie['cast']):
-                cast_display = f"Cast: {selected_movie['cast']}"
+            record = get_display_records(selected_movie.to_frame().T, model_version).iloc[0]
+            if catalog_model is not None:
+                recommendations = recommend_catalog_model(selected_movie['title'], catalog_model)
+            else:
+                recommendations = recommend_movies(selected_movie['title'], movies_df, similarity_matrix)
             
-            director_display = ""
-            if 'director' in selected_movie and pd.notna(selected_movie['director']):
-                director_display = f"🎬 {selected_movie['director']}"
+            # One poster lookup for the selected movie and every recommendation card
+            page_movies = pd.DataFrame({
+                'id': [selected_movie.get('id')] + list(recommendations.get('id', [])),
+                'title': [selected_movie['title']] + list(recommendations.get('title', [])),
+            })
+            poster_urls = get_movie_posters(page_movies)
             
             # Display selected movie
-            st.markdown(f"""
-            <div class="selected-movie-info">
-                <div class="movie-poster">
-                    <img src="{poster_url}" width="200" alt="{selected_movie['title']}">
-                </div>
-                <div class="movie-info-content">
-                    <h2 class="movie-info-title">{selected_movie['title']}</h2>
-                    <div class="movie-info-meta">
-                        <span class="movie-rating">⭐ {selected_movie['vote_average']:.1f}/10</span>
-                        <span class="movie-genre">🎭 {selected_movie['genres']}</span>
-                        <span>{director_display}</span>
-                        <span>{release_info}</span>
-                        <span>{runtime_info}</span>
-                    </div>
-                    <div class="movie-info-plot">
-                        <strong>Plot:</strong> {selected_movie['overview']}
-                    </div>
+            st.markdown(render_selected_movie(record, poster_urls[0]), unsafe_allow_html=True)
+            
+            if len(recommendations) > 0:
+                st.markdown("### You Might Also Like")
+                recommendation_records = get_display_records(recommendations, model_version)
+                for (_, record), similarity, poster_url in zip(recommendation_records.iterrows(), recommendations['similarity_score'], poster_urls[1:]):
+                    st.markdown(render_recommendation_card(record, similarity, poster_url), unsafe_allow_html=True)
+
+if __name__ == "__main__":
+    main()
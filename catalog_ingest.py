@@ -0,0 +1,388 @@
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from movie_parsing import DISPLAY_COLUMNS, clean_text, extract_cast_names, extract_director, extract_genre_names
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_N_FEATURES = 2 ** 18
+DEFAULT_TOP_K = 20
+# Upper bound on the similarity block held in memory while ranking neighbours
+NEIGHBOR_MEMORY_BUDGET = 256 * 1024 * 1024
+NEIGHBOR_MAX_BLOCK_SIZE = 1024
+# Scratch copy of the transposed feature matrix, removed once neighbours are ranked
+TRANSPOSE_FILES = ['transposed_data.npy', 'transposed_indices.npy', 'transposed_indptr.npy']
+
+# Lower-cased copies kept next to the display columns for serving-time search
+SEARCH_COLUMNS = {'title_search': 'title_search', 'genres_search': 'genres_search',
+                  'cast_search': 'cast_searchable', 'director_search': 'director_searchable'}
+
+
+def build_credits_index(credits_path, conn, chunksize=DEFAULT_CHUNK_SIZE):
+    # Parsed cast/director per movie_id, kept on disk so the join never needs both files in memory
+    conn.execute("CREATE TABLE IF NOT EXISTS credits (movie_id INTEGER PRIMARY KEY, cast_names TEXT, director_names TEXT)")
+    for chunk in pd.read_csv(credits_path, chunksize=chunksize):
+        id_col = 'movie_id' if 'movie_id' in chunk.columns else 'id'
+        cast_col = next((c for c in ('cast', 'cast_data') if c in chunk.columns), None)
+        crew_col = next((c for c in ('crew', 'crew_data') if c in chunk.columns), None)
+        chunk = chunk.dropna(subset=[id_col])
+        ids = chunk[id_col].astype('int64')
+        cast = chunk[cast_col].apply(extract_cast_names) if cast_col else pd.Series('', index=chunk.index)
+        director = chunk[crew_col].apply(extract_director) if crew_col else pd.Series('', index=chunk.index)
+        conn.executemany(
+            "INSERT OR REPLACE INTO credits (movie_id, cast_names, director_names) VALUES (?, ?, ?)",
+            zip(ids.tolist(), cast.tolist(), director.tolist()),
+        )
+    conn.commit()
+
+
+def lookup_credits(conn, movie_ids):
+    found = {}
+    movie_ids = [int(movie_id) for movie_id in movie_ids]
+    for start in range(0, len(movie_ids), 500):
+        chunk = movie_ids[start:start + 500]
+        placeholders = ','.join('?' * len(chunk))
+        for movie_id, cast, director in conn.execute(
+            f"SELECT movie_id, cast_names, director_names FROM credits WHERE movie_id IN ({placeholders})", chunk
+        ):
+            found[movie_id] = (cast, director)
+    return found
+
+
+def process_chunk(chunk, conn=None):
+    essential_cols = ['id', 'title', 'overview', 'genres', 'vote_average', 'vote_count',
+                      'popularity', 'release_date', 'runtime']
+    chunk = chunk[[col for col in essential_cols + ['cast', 'crew'] if col in chunk.columns]].copy()
+    chunk = chunk.dropna(subset=['id', 'title', 'overview'])
+    chunk = chunk[chunk['overview'].str.len() > 10]
+    chunk['id'] = chunk['id'].astype('int64')
+
+    chunk['genres'] = chunk['genres'].fillna('[]').apply(extract_genre_names)
+    chunk['overview'] = chunk['overview'].apply(clean_text)
+
+    if 'cast' in chunk.columns:
+        chunk['cast'] = chunk['cast'].apply(extract_cast_names)
+    else:
+        chunk['cast'] = ''
+    if 'crew' in chunk.columns:
+        chunk['director'] = chunk['crew'].apply(extract_director)
+        chunk = chunk.drop(columns=['crew'])
+    else:
+        chunk['director'] = ''
+
+    if conn is not None and len(chunk):
+        credits = lookup_credits(conn, chunk['id'])
+        cast = chunk['id'].map(lambda movie_id: credits.get(movie_id, ('', ''))[0])
+        director = chunk['id'].map(lambda movie_id: credits.get(movie_id, ('', ''))[1])
+        chunk['cast'] = chunk['cast'].where(chunk['cast'] != '', cast.fillna(''))
+        chunk['director'] = chunk['director'].where(chunk['director'] != '', director.fillna(''))
+
+    chunk['cast_searchable'] = chunk['cast'].str.lower().str.replace('|', ' ')
+    chunk['director_searchable'] = chunk['director'].str.lower().str.replace('|', ' ')
+    chunk['combined_features'] = (
+        chunk['overview'] + ' ' + chunk['genres'] + ' '
+        + chunk['cast'].str.replace('|', ' ') + ' ' + chunk['director']
+    ).str.strip()
+    return chunk.reset_index(drop=True)
+
+
+def create_vectorizer(n_features=DEFAULT_N_FEATURES):
+    # Stateless hashed feature space: every chunk maps into the same columns without a fitted vocabulary
+    from sklearn.feature_extraction.text import HashingVectorizer
+    return HashingVectorizer(
+        n_features=n_features,
+        stop_words='english',
+        lowercase=True,
+        ngram_range=(1, 2),
+        alternate_sign=False,
+        norm=None,
+    )
+
+
+def ingest_catalog(movies_path, credits_path, out_dir, chunksize=DEFAULT_CHUNK_SIZE,
+                   n_features=DEFAULT_N_FEATURES, top_k=DEFAULT_TOP_K):
+    # Built in a fresh sibling directory and renamed into place, so files that readers have
+    # mapped from a previous build are never truncated or rewritten
+    out_dir = os.path.abspath(out_dir)
+    parent = os.path.dirname(out_dir)
+    os.makedirs(parent, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix='.building-' + os.path.basename(out_dir) + '-', dir=parent)
+    os.chmod(build_dir, 0o755)
+    try:
+        meta = _build_index(movies_path, credits_path, build_dir, chunksize, n_features, top_k)
+    except Exception:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+    old_dir = None
+    if os.path.exists(out_dir):
+        old_dir = f"{out_dir}.old-{uuid.uuid4().hex[:8]}"
+        os.rename(out_dir, old_dir)
+    os.rename(build_dir, out_dir)
+    if old_dir is not None:
+        shutil.rmtree(old_dir, ignore_errors=True)
+    return meta
+
+
+def _build_index(movies_path, credits_path, out_dir, chunksize, n_features, top_k):
+    from scipy import sparse
+
+    parts_dir = os.path.join(out_dir, 'parts')
+    os.makedirs(parts_dir)
+    db_path = os.path.join(out_dir, 'catalog.sqlite3')
+
+    conn = sqlite3.connect(db_path)
+    try:
+        if credits_path:
+            build_credits_index(credits_path, conn, chunksize)
+
+        vectorizer = create_vectorizer(n_features)
+        doc_freq = np.zeros(n_features, dtype=np.int64)
+        part_files = []
+        n_rows = 0
+        nnz = 0
+
+        # Pass 1: parse, join and hash each chunk; only term counts and document frequencies are kept
+        for chunk in pd.read_csv(movies_path, chunksize=chunksize):
+            chunk = process_chunk(chunk, conn if credits_path else None)
+            if len(chunk) == 0:
+                continue
+            counts = vectorizer.transform(chunk['combined_features']).tocsr()
+            counts.sum_duplicates()
+            doc_freq += np.bincount(counts.indices, minlength=n_features)
+
+            part_path = os.path.join(parts_dir, f'part-{len(part_files):05d}.npz')
+            sparse.save_npz(part_path, counts)
+            part_files.append(part_path)
+
+            chunk['row'] = np.arange(n_rows, n_rows + len(chunk))
+            chunk['title_search'] = chunk['title'].astype(str).str.lower()
+            chunk['genres_search'] = chunk['genres'].astype(str).str.lower()
+            chunk[['row'] + DISPLAY_COLUMNS + ['title_search', 'genres_search']].to_sql(
+                'movies', conn, if_exists='append', index=False)
+            n_rows += len(chunk)
+            nnz += counts.nnz
+
+        conn.execute("CREATE INDEX IF NOT EXISTS movies_row ON movies (row)")
+        conn.execute("CREATE INDEX IF NOT EXISTS movies_title_search ON movies (title_search)")
+        conn.execute("CREATE INDEX IF NOT EXISTS movies_popularity ON movies (popularity)")
+        conn.execute("DROP TABLE IF EXISTS credits")
+        conn.commit()
+    finally:
+        conn.close()
+
+    # Pass 2: apply smoothed idf and l2 norm per chunk, streaming into preallocated on-disk CSR arrays
+    idf = (np.log((1 + n_rows) / (1 + doc_freq)) + 1).astype(np.float32)
+    data = np.lib.format.open_memmap(os.path.join(out_dir, 'data.npy'), mode='w+', dtype=np.float32, shape=(nnz,))
+    indices = np.lib.format.open_memmap(os.path.join(out_dir, 'indices.npy'), mode='w+', dtype=np.int32, shape=(nnz,))
+    indptr = np.lib.format.open_memmap(os.path.join(out_dir, 'indptr.npy'), mode='w+', dtype=np.int64, shape=(n_rows + 1,))
+    indptr[0] = 0
+    row_offset = 0
+    nnz_offset = 0
+    for part_path in part_files:
+        part = sparse.load_npz(part_path).tocsr().astype(np.float32)
+        part.data *= idf[part.indices]
+        norms = np.sqrt(np.asarray(part.multiply(part).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        part = sparse.diags(1 / norms).dot(part).tocsr()
+        data[nnz_offset:nnz_offset + part.nnz] = part.data
+        indices[nnz_offset:nnz_offset + part.nnz] = part.indices
+        indptr[row_offset + 1:row_offset + part.shape[0] + 1] = part.indptr[1:] + nnz_offset
+        row_offset += part.shape[0]
+        nnz_offset += part.nnz
+    for array in (data, indices, indptr):
+        array.flush()
+    del data, indices, indptr
+    shutil.rmtree(parts_dir, ignore_errors=True)
+
+    meta = {
+        'version': time.strftime('%Y%m%d%H%M%S') + '-' + uuid.uuid4().hex[:8],
+        'n_rows': n_rows, 'n_features': n_features, 'nnz': nnz, 'top_k': top_k,
+    }
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    build_neighbors(out_dir, top_k)
+    return meta
+
+
+def load_feature_matrix(index_dir):
+    from scipy import sparse
+
+    with open(os.path.join(index_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    data = np.load(os.path.join(index_dir, 'data.npy'), mmap_mode='r')
+    indices = np.load(os.path.join(index_dir, 'indices.npy'), mmap_mode='r')
+    indptr = np.load(os.path.join(index_dir, 'indptr.npy'), mmap_mode='r')
+    return sparse.csr_matrix((data, indices, indptr), shape=(meta['n_rows'], meta['n_features']), copy=False)
+
+
+def write_transpose(matrix, out_dir, chunk_rows=DEFAULT_CHUNK_SIZE):
+    """Write ``matrix.T`` as CSR arrays in ``out_dir`` without holding either matrix in memory.
+
+    Rows are scattered chunk by chunk into per-column slots, so only per-feature counters and
+    one chunk of entries are ever resident.
+    """
+    from scipy import sparse
+
+    n_rows, n_features = matrix.shape
+    counts = np.zeros(n_features, dtype=np.int64)
+    for start in range(0, n_rows, chunk_rows):
+        lo, hi = matrix.indptr[start], matrix.indptr[min(start + chunk_rows, n_rows)]
+        counts += np.bincount(matrix.indices[lo:hi], minlength=n_features)
+    indptr = np.zeros(n_features + 1, dtype=matrix.indptr.dtype)
+    np.cumsum(counts, out=indptr[1:])
+    del counts
+
+    paths = [os.path.join(out_dir, name) for name in TRANSPOSE_FILES]
+    data = np.lib.format.open_memmap(paths[0], mode='w+', dtype=matrix.data.dtype, shape=(matrix.nnz,))
+    indices = np.lib.format.open_memmap(paths[1], mode='w+', dtype=matrix.indices.dtype, shape=(matrix.nnz,))
+    np.save(paths[2], indptr)
+    cursor = indptr[:-1].astype(np.int64)
+    for start in range(0, n_rows, chunk_rows):
+        stop = min(start + chunk_rows, n_rows)
+        lo, hi = matrix.indptr[start], matrix.indptr[stop]
+        cols = np.asarray(matrix.indices[lo:hi])
+        rows = np.repeat(np.arange(start, stop, dtype=indices.dtype), np.diff(matrix.indptr[start:stop + 1]))
+        # Stable by column, so rows stay sorted within every output row
+        order = np.argsort(cols, kind='stable')
+        cols, rows = cols[order], rows[order]
+        unique, first, per_col = np.unique(cols, return_index=True, return_counts=True)
+        positions = cursor[cols] + (np.arange(len(cols)) - np.repeat(first, per_col))
+        data[positions] = np.asarray(matrix.data[lo:hi])[order]
+        indices[positions] = rows
+        cursor[unique] += per_col
+    data.flush()
+    indices.flush()
+    del data, indices
+    return sparse.csr_matrix(
+        tuple(np.load(path, mmap_mode='r') for path in paths), shape=(n_features, n_rows), copy=False)
+
+
+def build_neighbors(index_dir, top_k=DEFAULT_TOP_K, memory_budget=NEIGHBOR_MEMORY_BUDGET):
+    # Rows are l2-normalised, so a sparse dot product is the cosine similarity. Similarity
+    # blocks stay sparse and are sized from memory_budget, and the transpose is read from disk,
+    # so resident memory does not grow with the catalog.
+    matrix = load_feature_matrix(index_dir)
+    n_rows = matrix.shape[0]
+    k = max(0, min(top_k, n_rows - 1))
+    neighbors = np.lib.format.open_memmap(os.path.join(index_dir, 'neighbors.npy'), mode='w+', dtype=np.int32, shape=(n_rows, k))
+    scores = np.lib.format.open_memmap(os.path.join(index_dir, 'scores.npy'), mode='w+', dtype=np.float32, shape=(n_rows, k))
+    # Rows with fewer than k overlapping movies are padded with -1
+    neighbors[:] = -1
+    scores[:] = 0
+    if k > 0:
+        transposed = write_transpose(matrix, index_dir)
+        # Worst case a block row is dense: ~16 bytes per entry across scipy's product buffers
+        block_size = int(max(1, min(NEIGHBOR_MAX_BLOCK_SIZE, memory_budget // (16 * n_rows))))
+        for start in range(0, n_rows, block_size):
+            stop = min(start + block_size, n_rows)
+            block = matrix[start:stop].dot(transposed).tocsr()
+            for offset in range(stop - start):
+                row = start + offset
+                lo, hi = block.indptr[offset], block.indptr[offset + 1]
+                cols = block.indices[lo:hi]
+                vals = block.data[lo:hi]
+                keep = cols != row
+                cols, vals = cols[keep], vals[keep]
+                if len(vals) > k:
+                    top = np.argpartition(-vals, k - 1)[:k]
+                    cols, vals = cols[top], vals[top]
+                order = np.argsort(-vals, kind='stable')
+                neighbors[row, :len(order)] = cols[order]
+                scores[row, :len(order)] = vals[order]
+        del transposed
+        for name in TRANSPOSE_FILES:
+            os.remove(os.path.join(index_dir, name))
+    neighbors.flush()
+    scores.flush()
+
+
+class CatalogIndex:
+    """Read-only view of an index directory written by ``ingest_catalog``.
+
+    Rows are read from SQLite on demand, so serving never loads the whole catalog. It offers
+    the same frame/nlargest/search/similar interface as ``model_store.SharedModel``.
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.version = self.meta.get('version', f"index-{self.meta['n_rows']}")
+        self.neighbors = np.load(os.path.join(index_dir, 'neighbors.npy'), mmap_mode='r')
+        self.scores = np.load(os.path.join(index_dir, 'scores.npy'), mmap_mode='r')
+        # Held open so a re-ingest that swaps the directory cannot mix old arrays with new rows
+        db_path = os.path.abspath(os.path.join(index_dir, 'catalog.sqlite3'))
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.meta['n_rows']
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def feature_matrix(self):
+        return load_feature_matrix(self.index_dir)
+
+    def frame(self, rows, columns=None):
+        # Materialises only the requested rows; the index is the catalog row number
+        rows = [int(row) for row in rows]
+        columns = columns or DISPLAY_COLUMNS
+        quoted = ', '.join('"' + col + '"' for col in columns)
+        found = {}
+        for start in range(0, len(rows), 500):
+            chunk = rows[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for record in self._query(f"SELECT row, {quoted} FROM movies WHERE row IN ({placeholders})", chunk):
+                found[record[0]] = record[1:]
+        rows = [row for row in rows if row in found]
+        return pd.DataFrame([found[row] for row in rows], columns=columns, index=rows)
+
+    def nlargest(self, n, column):
+        if column not in DISPLAY_COLUMNS:
+            raise ValueError(f"Unknown column: {column}")
+        rows = self._query(f'SELECT row FROM movies ORDER BY "{column}" DESC LIMIT ?', (int(n),))
+        return self.frame([row for (row,) in rows])
+
+    def search(self, index_name, query, exact=False):
+        column = SEARCH_COLUMNS[index_name]
+        condition = f'"{column}" = ?' if exact else f'instr("{column}", ?) > 0'
+        return [row for (row,) in self._query(f"SELECT row FROM movies WHERE {condition} ORDER BY row", (query,))]
+
+    def similar(self, row, n=6):
+        indices = np.asarray(self.neighbors[row, :n])
+        keep = indices >= 0
+        return indices[keep], np.asarray(self.scores[row, :n])[keep]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an on-disk catalog index from the movies and credits CSV files.")
+    parser.add_argument('movies')
+    parser.add_argument('out_dir')
+    parser.add_argument('--credits')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--n-features', type=int, default=DEFAULT_N_FEATURES)
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+    args = parser.parse_args()
+    meta = ingest_catalog(args.movies, args.credits, args.out_dir, args.chunksize, args.n_features, args.top_k)
+    print(f"Indexed {meta['n_rows']} movies ({meta['nnz']} non-zeros) into {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+import argparse
+import json
+import logging
+import mmap
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from movie_parsing import DISPLAY_COLUMNS
+
+NUMERIC_COLUMNS = ['id', 'vote_average', 'vote_count', 'popularity', 'runtime']
+STRING_COLUMNS = [col for col in DISPLAY_COLUMNS if col not in NUMERIC_COLUMNS]
+# Lower-cased copies used for substring search; (index name, source column)
+SEARCH_INDEXES = [('title_search', 'title'), ('genres_search', 'genres'),
+                  ('cast_search', 'cast_searchable'), ('director_search', 'director_searchable')]
+MATRIX_FILES = ['data.npy', 'indices.npy', 'indptr.npy']
+NEIGHBOR_FILES = ['neighbors.npy', 'scores.npy']
+CURRENT_FILE = 'CURRENT'
+DEFAULT_KEEP_VERSIONS = 2
+
+logger = logging.getLogger(__name__)
+
+# String columns are stored as one NUL-separated UTF-8 blob plus row offsets, so rows can be
+# sliced straight out of the shared mapping and a search needle can never span two rows.
+SEPARATOR = b'\x00'
+
+
+class StringColumnWriter:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path + '.bin', 'wb')
+        self._file.write(SEPARATOR)
+        self._position = len(SEPARATOR)
+        self._offsets = [np.array([self._position], dtype=np.int64)]
+
+    def append(self, values):
+        encoded = [('' if pd.isna(value) else str(value)).replace('\x00', '').encode('utf-8') for value in values]
+        lengths = np.fromiter((len(value) + 1 for value in encoded), dtype=np.int64, count=len(encoded))
+        self._offsets.append(self._position + np.cumsum(lengths))
+        self._file.write(SEPARATOR.join(encoded) + SEPARATOR if encoded else b'')
+        self._position += int(lengths.sum())
+
+    def close(self):
+        self._file.close()
+        np.save(self.path + '.offsets.npy', np.concatenate(self._offsets))
+
+
+class StringColumn:
+    """Zero-copy view of a string column; rows are decoded only when accessed."""
+
+    def __init__(self, path):
+        with open(path + '.bin', 'rb') as f:
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offsets = np.load(path + '.offsets.npy', mmap_mode='r')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        start = int(self.offsets[row])
+        stop = int(self.offsets[row + 1]) - 1
+        return self._blob[start:stop].decode('utf-8')
+
+    def take(self, rows):
+        return [self[row] for row in rows]
+
+    def _row_at(self, position):
+        return int(np.searchsorted(self.offsets, position, side='right')) - 1
+
+    def find_exact(self, value):
+        needle = SEPARATOR + value.encode('utf-8') + SEPARATOR
+        rows = []
+        position = self._blob.find(needle)
+        while position != -1:
+            rows.append(self._row_at(position + 1))
+            position = self._blob.find(needle, position + 1)
+        return rows
+
+    def find_substring(self, value):
+        needle = value.encode('utf-8')
+        if not needle or SEPARATOR in needle:
+            return []
+        rows = []
+        position = self._blob.find(needle)
+        while position != -1:
+            row = self._row_at(position)
+            rows.append(row)
+            position = self._blob.find(needle, int(self.offsets[row + 1]))
+        return rows
+
+    def close(self):
+        self._blob.close()
+
+
+class SharedModel:
+    """One attached model version; every array is a read-only mapping shared through the page cache."""
+
+    def __init__(self, version_dir):
+        self.version_dir = version_dir
+        with open(os.path.join(version_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.version = self.meta['version']
+        self.columns = {}
+        for name in self.meta['numeric_columns']:
+            self.columns[name] = np.load(os.path.join(version_dir, name + '.npy'), mmap_mode='r')
+        for name in self.meta['string_columns']:
+            self.columns[name] = StringColumn(os.path.join(version_dir, name))
+        self.search_indexes = {name: StringColumn(os.path.join(version_dir, name))
+                               for name, _ in SEARCH_INDEXES}
+        self.neighbors = np.load(os.path.join(version_dir, 'neighbors.npy'), mmap_mode='r')
+        self.scores = np.load(os.path.join(version_dir, 'scores.npy'), mmap_mode='r')
+
+    def __len__(self):
+        return self.meta['n_rows']
+
+    def feature_matrix(self):
+        if not self.meta.get('has_matrix'):
+            return None
+        from scipy import sparse
+        data, indices, indptr = [np.load(os.path.join(self.version_dir, name), mmap_mode='r')
+                                 for name in MATRIX_FILES]
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(self), self.meta['n_features']), copy=False)
+
+    def frame(self, rows, columns=None):
+        # Materialises only the requested rows; the index is the model row number
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = columns or list(self.columns)
+        data = {}
+        for name in columns:
+            column = self.columns[name]
+            if isinstance(column, StringColumn):
+                data[name] = column.take(rows)
+            else:
+                data[name] = np.asarray(column[rows])
+        return pd.DataFrame(data, index=rows)
+
+    def nlargest(self, n, column):
+        values = np.nan_to_num(np.asarray(self.columns[column], dtype=np.float64), nan=-np.inf)
+        n = min(n, len(values))
+        if n == 0:
+            return self.frame([])
+        top = np.argpartition(-values, n - 1)[:n]
+        top = top[np.argsort(-values[top], kind='stable')]
+        return self.frame(top)
+
+    def search(self, index_name, query, exact=False):
+        index = self.search_indexes[index_name]
+        return index.find_exact(query) if exact else index.find_substring(query)
+
+    def similar(self, row, n=6):
+        # Neighbour rows are padded with -1 when fewer than top_k movies overlap
+        indices = np.asarray(self.neighbors[row, :n])
+        keep = indices >= 0
+        return indices[keep], np.asarray(self.scores[row, :n])[keep]
+
+    def close(self):
+        for column in list(self.columns.values()) + list(self.search_indexes.values()):
+            if isinstance(column, StringColumn):
+                column.close()
+
+
+class ModelStore:
+    """Attaches to the version named in ``<root>/CURRENT`` and follows it when it is swapped.
+
+    One store is shared by every session thread, so checks and attaches happen under a lock
+    and a swap maps the new version once.
+    """
+
+    def __init__(self, root, check_interval=5.0):
+        self.root = root
+        self.check_interval = check_interval
+        self._model = None
+        self._checked_at = 0.0
+        self._missing_logged = False
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def current(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._model is not None and now - self._checked_at < self.check_interval:
+                return self._model
+            self._checked_at = now
+            version = self._current_version()
+            if version is None:
+                # Reported once until a version shows up, not on every rerun of every session
+                if self._model is None and not self._missing_logged:
+                    logger.warning("No model published in %s yet", self.root)
+                    self._missing_logged = True
+                return self._model
+            if self._model is None or self._model.version != version:
+                # Old mappings stay valid until released even if the publisher prunes their files
+                try:
+                    self._model = self._attach(version)
+                    self._missing_logged = False
+                except FileNotFoundError:
+                    if self._model is None:
+                        raise
+            return self._model
+
+    def _attach(self, version):
+        try:
+            return SharedModel(os.path.join(self.root, 'versions', version))
+        except FileNotFoundError:
+            # The version was pruned between reading CURRENT and opening it; follow the pointer once more
+            latest = self._current_version()
+            if latest is None or latest == version:
+                raise
+            return SharedModel(os.path.join(self.root, 'versions', latest))
+
+
+def _write_columns(version_dir, chunks):
+    writers = {name: StringColumnWriter(os.path.join(version_dir, name)) for name in STRING_COLUMNS}
+    search_writers = {name: StringColumnWriter(os.path.join(version_dir, name)) for name, _ in SEARCH_INDEXES}
+    numeric = {name: [] for name in NUMERIC_COLUMNS}
+    n_rows = 0
+    for chunk in chunks:
+        for name, writer in writers.items():
+            writer.append(chunk[name].tolist() if name in chunk.columns else [''] * len(chunk))
+        for name, source in SEARCH_INDEXES:
+            values = chunk[source].fillna('').astype(str).str.lower() if source in chunk.columns else pd.Series([''] * len(chunk))
+            search_writers[name].append(values.tolist())
+        for name in NUMERIC_COLUMNS:
+            values = pd.to_numeric(chunk[name], errors='coerce') if name in chunk.columns else pd.Series(np.nan, index=chunk.index)
+            numeric[name].append(values.to_numpy(dtype=np.float64))
+        n_rows += len(chunk)
+    for writer in list(writers.values()) + list(search_writers.values()):
+        writer.close()
+    for name, parts in numeric.items():
+        values = np.concatenate(parts) if parts else np.zeros(0)
+        if name == 'id':
+            values = np.nan_to_num(values, nan=-1).astype(np.int64)
+        np.save(os.path.join(version_dir, name + '.npy'), values)
+    return n_rows
+
+
+def _publish(root, fill_version, keep=DEFAULT_KEEP_VERSIONS):
+    versions_dir = os.path.join(root, 'versions')
+    os.makedirs(versions_dir, exist_ok=True)
+    version = time.strftime('%Y%m%d%H%M%S') + '-' + uuid.uuid4().hex[:8]
+    staging_dir = os.path.join(versions_dir, '.staging-' + version)
+    os.makedirs(staging_dir)
+    try:
+        meta = fill_version(staging_dir)
+        meta.update({
+            'version': version,
+            'numeric_columns': NUMERIC_COLUMNS,
+            'string_columns': STRING_COLUMNS,
+        })
+        with open(os.path.join(staging_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        os.rename(staging_dir, os.path.join(versions_dir, version))
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    # Readers only ever see a fully written version: the pointer is swapped with an atomic rename
+    pointer_tmp = os.path.join(root, CURRENT_FILE + '.' + version)
+    with open(pointer_tmp, 'w') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(root, CURRENT_FILE))
+
+    previous = sorted(name for name in os.listdir(versions_dir)
+                      if not name.startswith('.') and name != version)
+    for name in previous[:max(0, len(previous) - (keep - 1))]:
+        shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+    return version
+
+
+def publish_catalog_index(index_dir, root, chunksize=10000, keep=DEFAULT_KEEP_VERSIONS):
+    """Publish an index directory written by ``catalog_ingest.ingest_catalog``."""
+    def fill_version(version_dir):
+        conn = sqlite3.connect(os.path.join(index_dir, 'catalog.sqlite3'))
+        try:
+            quoted = ', '.join('"' + col + '"' for col in DISPLAY_COLUMNS)
+            chunks = pd.read_sql_query(f"SELECT {quoted} FROM movies ORDER BY row", conn, chunksize=chunksize)
+            n_rows = _write_columns(version_dir, chunks)
+        finally:
+            conn.close()
+        # Copied, not hard-linked: a published version must never share an inode with a
+        # directory that ingestion may rewrite while workers have it mapped
+        for name in MATRIX_FILES + NEIGHBOR_FILES:
+            shutil.copyfile(os.path.join(index_dir, name), os.path.join(version_dir, name))
+        with open(os.path.join(index_dir, 'meta.json')) as f:
+            index_meta = json.load(f)
+        return {'n_rows': n_rows, 'n_features': index_meta['n_features'], 'has_matrix': True}
+
+    return _publish(root, fill_version, keep)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish a catalog index as a new shared model version.")
+    parser.add_argument('index_dir')
+    parser.add_argument('store_root')
+    parser.add_argument('--keep', type=int, default=DEFAULT_KEEP_VERSIONS)
+    args = parser.parse_args()
+    version = publish_catalog_index(args.index_dir, args.store_root, keep=args.keep)
+    print(f"Published model version {version} to {args.store_root}")
+
+
+if __name__ == '__main__':
+    main()
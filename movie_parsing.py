@@ -0,0 +1,69 @@
+import json
+import re
+
+import pandas as pd
+
+# Per-movie columns every serving backend exposes; kept here so the app can share them without
+# importing the ingestion pipeline
+DISPLAY_COLUMNS = ['id', 'title', 'overview', 'genres', 'vote_average', 'vote_count',
+                   'popularity', 'release_date', 'runtime', 'cast', 'director',
+                   'cast_searchable', 'director_searchable']
+# One entry of the credits export's cast column: "Name|Character|order"
+CAST_ENTRY = re.compile(r'^[^|]*\|[^|]*\|\d+~*$')
+
+
+def clean_text(text):
+    if pd.isna(text) or text == '':
+        return ''
+    text = str(text)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def _parse_json_list(text):
+    try:
+        data = json.loads(str(text).replace("'", '"'))
+        return data if isinstance(data, list) else None
+    except Exception:
+        return None
+
+
+def extract_genre_names(text):
+    if pd.isna(text) or text == '':
+        return 'Unknown'
+    data = _parse_json_list(text)
+    if data is not None:
+        return ' '.join([item['name'] for item in data[:3] if isinstance(item, dict) and 'name' in item])
+    return clean_text(text)
+
+
+def extract_cast_names(text):
+    # Accepts TMDB JSON lists, the "Name|Character|order~~..." credits export, or plain text
+    if pd.isna(text) or text == '':
+        return ''
+    data = _parse_json_list(text)
+    if data is not None:
+        return ' | '.join([actor['name'] for actor in data[:10] if isinstance(actor, dict) and 'name' in actor])
+    text = str(text)
+    if '~~' in text or CAST_ENTRY.match(text):
+        names = [entry.split('|', 1)[0].strip() for entry in text.split('~~')]
+        return ' | '.join([name for name in names if name][:10])
+    return clean_text(text)
+
+
+def extract_director(text):
+    # Accepts TMDB JSON lists or the "Job|Name|Department~~..." credits export
+    if pd.isna(text) or text == '':
+        return ''
+    data = _parse_json_list(text)
+    if data is not None:
+        directors = [person['name'] for person in data
+                     if isinstance(person, dict) and person.get('job') == 'Director' and 'name' in person]
+        return ' | '.join(directors[:3])
+    directors = []
+    for entry in str(text).split('~~'):
+        parts = entry.split('|')
+        if len(parts) >= 2 and parts[0].strip() == 'Director':
+            directors.append(parts[1].strip())
+    return ' | '.join(directors[:3])
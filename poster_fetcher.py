@@ -0,0 +1,362 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+TMDB_API_BASE = "https://api.themoviedb.org/3"
+TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p/w500"
+PLACEHOLDER_POSTER = "https://via.placeholder.com/300x450/1f1f1f/ffffff?text=🎬+Movie"
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "cinema_vault", "posters.sqlite3")
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_NEGATIVE_TTL = 24 * 3600
+DEFAULT_FAILURE_TTL = 60
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_COOLDOWN = 30
+DEFAULT_MAX_RETRY_AFTER = 5
+DEFAULT_PURGE_INTERVAL = 3600
+
+
+def normalize_id(tmdb_id):
+    # None for anything that is not a usable id (None, NaN, pd.NA, empty strings)
+    if tmdb_id is None:
+        return None
+    try:
+        value = float(tmdb_id)
+    except (TypeError, ValueError):
+        return None
+    if value != value:
+        return None
+    return int(value)
+
+
+def cache_key(tmdb_id=None, title=None):
+    tmdb_id = normalize_id(tmdb_id)
+    if tmdb_id is not None:
+        return f"id:{tmdb_id}"
+    if isinstance(title, str) and title.strip():
+        return f"title:{title.strip().lower()}"
+    return None
+
+
+class PosterCache:
+    """SQLite-backed metadata cache with TTL expiry and negative entries for misses."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL,
+                 purge_interval=DEFAULT_PURGE_INTERVAL):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.purge_interval = purge_interval
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS posters ("
+            "key TEXT PRIMARY KEY, data TEXT, expires_at REAL NOT NULL)"
+        )
+        self.purge_expired()
+
+    def get_many(self, keys):
+        # Returns {key: metadata or None}; None marks a cached miss. Expired keys are omitted.
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, data, expires_at FROM posters WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, data, expires_at in rows:
+                    if expires_at > now:
+                        found[key] = json.loads(data) if data is not None else None
+        return found
+
+    def set_many(self, entries):
+        now = time.time()
+        rows = []
+        for key, data in entries.items():
+            if data is None:
+                rows.append((key, None, now + self.negative_ttl))
+            else:
+                rows.append((key, json.dumps(data), now + self.ttl))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                # Expired rows are dropped on the write path so a long-running cache file stays bounded
+                if now - self._purged_at >= self.purge_interval:
+                    self._delete_expired(now)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO posters (key, data, expires_at) VALUES (?, ?, ?)", rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _delete_expired(self, now):
+        self._conn.execute("DELETE FROM posters WHERE expires_at <= ?", (now,))
+        self._purged_at = now
+
+    def purge_expired(self):
+        with self._lock:
+            self._delete_expired(time.time())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RateLimiter:
+    """Token bucket shared by all worker threads."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CappedRetry(Retry):
+    """Retry policy that never sleeps longer than ``max_retry_after`` for a ``Retry-After`` header."""
+
+    def __init__(self, *args, max_retry_after=DEFAULT_MAX_RETRY_AFTER, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_retry_after = max_retry_after
+
+    def new(self, **kw):
+        kw.setdefault('max_retry_after', self.max_retry_after)
+        return super().new(**kw)
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.max_retry_after)
+
+
+def create_session(pool_size=16, retries=3, backoff_factor=0.5, max_retry_after=DEFAULT_MAX_RETRY_AFTER):
+    retry = CappedRetry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+        max_retry_after=max_retry_after,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class FailureTracker:
+    """Short-lived, in-memory memory of transient failures.
+
+    Keys that just failed are skipped for ``failure_ttl`` seconds, and after ``threshold``
+    consecutive failures every lookup is skipped for ``cooldown`` seconds, so an upstream
+    outage costs one slow page instead of one per rerun.
+    """
+
+    def __init__(self, failure_ttl=DEFAULT_FAILURE_TTL, threshold=DEFAULT_BREAKER_THRESHOLD,
+                 cooldown=DEFAULT_BREAKER_COOLDOWN):
+        self.failure_ttl = failure_ttl
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failed = {}
+        self._consecutive = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        with self._lock:
+            return time.monotonic() < self._open_until
+
+    def should_skip(self, key):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._open_until:
+                return True
+            expires_at = self._failed.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= now:
+                del self._failed[key]
+                return False
+            return True
+
+    def record_failure(self, key, retry_after=None):
+        # ``retry_after`` comes from a 429: the upstream asked every caller to back off, so the
+        # breaker opens for that long (at most ``cooldown``) instead of sleeping on the request
+        now = time.monotonic()
+        with self._lock:
+            # Expired entries are swept here, so keys that never come back do not pile up
+            self._failed = {k: expires_at for k, expires_at in self._failed.items() if expires_at > now}
+            self._failed[key] = now + self.failure_ttl
+            self._consecutive += 1
+            if retry_after is not None:
+                self._open_until = max(self._open_until, now + min(retry_after, self.cooldown))
+            if self._consecutive >= self.threshold:
+                self._open_until = max(self._open_until, now + self.cooldown)
+                self._consecutive = 0
+
+    def record_success(self, key):
+        with self._lock:
+            self._failed.pop(key, None)
+            self._consecutive = 0
+
+
+def _retry_after_seconds(response):
+    # Only the delta-seconds form is honoured; an HTTP date falls back to the breaker cooldown
+    try:
+        return max(0.0, float(response.headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return float('inf')
+
+
+class PosterFetcher:
+    """Batch poster/metadata lookups against TMDB.
+
+    Cache hits are served from disk; misses are fetched concurrently over one pooled
+    session. ``api_base`` and ``image_base`` can point at a local stub server. Transient
+    failures are never written to the disk cache; ``failures`` remembers them briefly instead.
+    """
+
+    def __init__(self, api_key, cache=None, api_base=TMDB_API_BASE, image_base=TMDB_IMAGE_BASE,
+                 max_workers=8, requests_per_second=20, timeout=10, retries=3, backoff_factor=0.5,
+                 max_retry_after=DEFAULT_MAX_RETRY_AFTER, session=None, failures=None):
+        self.api_key = api_key
+        self.cache = cache if cache is not None else PosterCache()
+        self.api_base = api_base.rstrip('/')
+        self.image_base = image_base.rstrip('/')
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.session = session if session is not None else create_session(
+            max_workers, retries, backoff_factor, max_retry_after)
+        self.failures = failures if failures is not None else FailureTracker()
+
+    def _get(self, path, params):
+        self.rate_limiter.acquire()
+        response = self.session.get(
+            f"{self.api_base}{path}",
+            params=dict(params, api_key=self.api_key),
+            timeout=self.timeout,
+        )
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def _image_url(self, path):
+        if not path:
+            return None
+        return f"{self.image_base}{path}"
+
+    def _to_metadata(self, data):
+        if not data or not data.get('poster_path'):
+            return None
+        return {
+            'tmdb_id': data.get('id'),
+            'poster_url': self._image_url(data.get('poster_path')),
+            'backdrop_url': self._image_url(data.get('backdrop_path')),
+            'tagline': data.get('tagline') or '',
+            'imdb_id': data.get('imdb_id'),
+            'homepage': data.get('homepage') or '',
+        }
+
+    def fetch_one(self, tmdb_id=None, title=None):
+        tmdb_id = normalize_id(tmdb_id)
+        if tmdb_id is not None:
+            return self._to_metadata(self._get(f"/movie/{tmdb_id}", {}))
+        if isinstance(title, str) and title.strip():
+            data = self._get("/search/movie", {'query': title})
+            results = (data or {}).get('results') or []
+            return self._to_metadata(results[0]) if results else None
+        return None
+
+    def _fetch_key(self, lookup):
+        key, tmdb_id, title = lookup
+        if self.failures.should_skip(key):
+            return key, None, False
+        try:
+            metadata = self.fetch_one(tmdb_id, title)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 429:
+                self.failures.record_failure(key, retry_after=_retry_after_seconds(e.response))
+            else:
+                self.failures.record_failure(key)
+            return key, None, False
+        except (requests.RequestException, ValueError):
+            # Transient failures are not negatively cached; they are only skipped for a short while
+            self.failures.record_failure(key)
+            return key, None, False
+        self.failures.record_success(key)
+        return key, metadata, True
+
+    def fetch_many(self, movies):
+        """Resolve metadata for ``(tmdb_id, title)`` pairs; returns ``{cache_key: metadata or None}``."""
+        lookups = {}
+        for tmdb_id, title in movies:
+            key = cache_key(tmdb_id, title)
+            if key is not None and key not in lookups:
+                lookups[key] = (key, tmdb_id, title)
+
+        results = self.cache.get_many(lookups.keys())
+        pending = [lookup for key, lookup in lookups.items() if key not in results]
+        if not pending or not self.api_key or self.failures.is_open():
+            for key, _, _ in pending:
+                results[key] = None
+            return results
+
+        fetched = {}
+        workers = max(1, min(self.max_workers, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for key, metadata, cacheable in executor.map(self._fetch_key, pending):
+                results[key] = metadata
+                if cacheable:
+                    fetched[key] = metadata
+        self.cache.set_many(fetched)
+        return results
+
+    def poster_urls(self, movies, placeholder=PLACEHOLDER_POSTER):
+        movies = list(movies)
+        metadata = self.fetch_many(movies)
+        urls = []
+        for tmdb_id, title in movies:
+            entry = metadata.get(cache_key(tmdb_id, title))
+            urls.append(entry['poster_url'] if entry else placeholder)
+        return urls
+
+    def close(self):
+        self.session.close()
+        self.cache.close()
@@ -0,0 +1,34 @@
+import json
+import os
+import random
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = "space war love heist dream crime family robot ocean magic city king".split()
+
+
+def _write_movies(path, n_rows, seed=0):
+    rng = random.Random(seed)
+    rows = [{
+        'id': movie_id,
+        'title': f'Movie {movie_id}',
+        'overview': ' '.join(rng.choices(WORDS, k=15)),
+        'genres': json.dumps([{'id': 1, 'name': rng.choice(['Action', 'Drama', 'Comedy'])}]),
+        'vote_average': rng.random() * 10,
+        'vote_count': 10,
+        'popularity': rng.random() * 100,
+        'release_date': '2001-01-01',
+        'runtime': 100,
+    } for movie_id in range(1, n_rows + 1)]
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def write_movies():
+    """Writes a small synthetic movies CSV: ``write_movies(path, n_rows, seed=0)``."""
+    return _write_movies
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from catalog_ingest import (TRANSPOSE_FILES, CatalogIndex, build_neighbors, ingest_catalog,
+                            load_feature_matrix, write_transpose)
+from movie_parsing import extract_cast_names, extract_director
+
+
+@pytest.fixture
+def index_dir(tmp_path, write_movies):
+    credits = pd.DataFrame([
+        {'movie_id': 1, 'cast_data': 'Taylor Kitsch|John Carter|0~~Lynn Collins|Dejah Thoris|1',
+         'crew_data': 'Director|Andrew Stanton|Directing~~Producer|Jim Morris|Production'},
+    ])
+    credits.to_csv(tmp_path / 'credits.csv', index=False)
+    out_dir = str(tmp_path / 'index')
+    ingest_catalog(write_movies(tmp_path / 'movies.csv', 120), str(tmp_path / 'credits.csv'), out_dir,
+                   chunksize=50, n_features=2 ** 12)
+    return out_dir
+
+
+def test_parsers_read_credits_export_and_plain_text():
+    assert extract_cast_names('Taylor Kitsch|John Carter|0~~Lynn Collins|Dejah Thoris|1') == 'Taylor Kitsch | Lynn Collins'
+    assert extract_cast_names('Brad Pitt | Edward Norton') == 'Brad Pitt | Edward Norton'
+    assert extract_cast_names('[{"name": "Brad Pitt"}]') == 'Brad Pitt'
+    assert extract_director('Director|Andrew Stanton|Directing~~Producer|Jim Morris|Production') == 'Andrew Stanton'
+    assert extract_director('[{"job": "Director", "name": "David Fincher"}]') == 'David Fincher'
+
+
+def test_catalog_index_serves_rows_lazily(index_dir):
+    index = CatalogIndex(index_dir)
+
+    assert len(index) == 120
+    movie = index.frame([0])
+    assert movie['cast'].iloc[0] == 'Taylor Kitsch | Lynn Collins'
+    assert movie['director'].iloc[0] == 'Andrew Stanton'
+    assert index.search('cast_search', 'kitsch') == [0]
+    assert index.search('title_search', 'movie 12', exact=True) == [11]
+    assert 11 in index.search('title_search', 'movie 12')
+
+    popular = index.nlargest(5, 'popularity')
+    assert list(popular['popularity']) == sorted(popular['popularity'], reverse=True)
+    assert popular['popularity'].iloc[0] == pd.read_csv(index_dir + '/../movies.csv')['popularity'].max()
+
+
+def test_neighbors_match_dense_cosine_ranking(index_dir):
+    matrix = load_feature_matrix(index_dir)
+    dense = (matrix @ matrix.T).toarray()
+    np.fill_diagonal(dense, -np.inf)
+
+    # A tiny budget forces one-row blocks
+    build_neighbors(index_dir, top_k=5, memory_budget=1)
+    index = CatalogIndex(index_dir)
+    for row in (0, 37, 119):
+        rows, scores = index.similar(row, 5)
+        assert row not in rows
+        assert np.allclose(scores, np.sort(dense[row])[::-1][:5], atol=1e-5)
+        assert np.allclose(dense[row, rows], scores, atol=1e-5)
+
+
+def test_rows_without_overlap_are_not_padded_into_results(tmp_path):
+    pd.DataFrame([
+        {'id': 1, 'title': 'A', 'overview': 'alpha bravo charlie delta', 'genres': '[]',
+         'vote_average': 1, 'vote_count': 1, 'popularity': 1, 'release_date': '', 'runtime': 90},
+        {'id': 2, 'title': 'B', 'overview': 'echo foxtrot golf hotel', 'genres': '[]',
+         'vote_average': 1, 'vote_count': 1, 'popularity': 1, 'release_date': '', 'runtime': 90},
+    ]).to_csv(tmp_path / 'movies.csv', index=False)
+    ingest_catalog(str(tmp_path / 'movies.csv'), None, str(tmp_path / 'index'), n_features=2 ** 10)
+
+    rows, scores = CatalogIndex(str(tmp_path / 'index')).similar(0)
+    assert len(rows) == 0 and len(scores) == 0
+
+
+def test_transpose_is_written_out_of_core(index_dir, tmp_path):
+    matrix = load_feature_matrix(index_dir)
+    transposed = write_transpose(matrix, str(tmp_path), chunk_rows=7)
+
+    expected = matrix.T.tocsr()
+    expected.sort_indices()
+    assert np.array_equal(transposed.indptr, expected.indptr)
+    assert np.array_equal(transposed.indices, expected.indices)
+    assert np.array_equal(transposed.data, expected.data)
+    # The neighbour pass removes its scratch transpose
+    assert not any((tmp_path / 'index' / name).exists() for name in TRANSPOSE_FILES)
@@ -0,0 +1,96 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('streamlit')
+
+from app import DisplayRecordCache, build_display_records, get_popular_movies
+
+
+def make_movies(ids, **columns):
+    data = {
+        'id': ids,
+        'title': [f'Movie {movie_id}' for movie_id in ids],
+        'overview': ['An overview.'] * len(ids),
+        'genres': ['Drama'] * len(ids),
+        'vote_average': [7.0] * len(ids),
+        'release_date': ['2001-05-01'] * len(ids),
+        'runtime': [100] * len(ids),
+        'director': [''] * len(ids),
+        'cast': [''] * len(ids),
+    }
+    data.update(columns)
+    return pd.DataFrame(data)
+
+
+def test_formats_missing_zero_and_short_values():
+    movies = make_movies(
+        [1, 2, 3, 4],
+        runtime=[float('nan'), 0, 45, 125],
+        release_date=[float('nan'), '', '1999-01-01', '2010-12-31'],
+        vote_average=[float('nan'), 0, 7.26, 10],
+    )
+    records = build_display_records(movies)
+
+    assert records['runtime_text'].tolist() == ['', '', '⏱️ 45min', '⏱️ 2h 5min']
+    assert records['year'].tolist() == ['', '', '1999', '2010']
+    assert records['rating'].tolist() == ['0.0', '0.0', '7.3', '10.0']
+    assert records.loc[1, 'option_label'] == 'Movie 1 - ⭐0.0'
+    assert records.loc[3, 'option_label'] == 'Movie 3 (1999) - ⭐7.3'
+    assert '📅' not in records.loc[1, 'info_html']
+
+
+def test_title_and_overview_are_escaped():
+    movies = make_movies([1], title=['<b>Tom & Jerry</b>'], overview=['<script>alert(1)</script>'])
+    record = build_display_records(movies).loc[1]
+
+    for column in ('info_html', 'card_html'):
+        assert '&lt;b&gt;Tom &amp; Jerry&lt;/b&gt;' in record[column]
+        assert '&lt;script&gt;alert(1)&lt;/script&gt;' in record[column]
+        assert '<b>' not in record[column] and '<script>' not in record[column]
+    assert record['title_html'] == '&lt;b&gt;Tom &amp; Jerry&lt;/b&gt;'
+
+
+def test_cache_evicts_least_recently_used():
+    cache = DisplayRecordCache(max_records=3)
+    cache.get(make_movies([1, 2, 3]), 'v1')
+    cache.get(make_movies([1]), 'v1')
+    cache.get(make_movies([4]), 'v1')
+
+    assert list(cache._records) == [3, 1, 4]
+
+
+def test_cache_empties_when_model_version_changes():
+    cache = DisplayRecordCache()
+    cache.get(make_movies([1, 2]), 'v1')
+    records = cache.get(make_movies([3], title=['Renamed']), 'v2')
+
+    assert list(cache._records) == [3]
+    assert records.loc[3, 'title_html'] == 'Renamed'
+
+
+def test_cache_returns_rows_in_input_order():
+    cache = DisplayRecordCache()
+    cache.get(make_movies([2, 4]), 'v1')
+
+    records = cache.get(make_movies([5, 4, 1, 2]), 'v1')
+
+    assert records.index.tolist() == [5, 4, 1, 2]
+    assert records['title_html'].tolist() == ['Movie 5', 'Movie 4', 'Movie 1', 'Movie 2']
+
+
+def test_popular_movies_keep_only_recent_versions():
+    class Catalog:
+        calls = 0
+
+        def nlargest(self, n, column):
+            Catalog.calls += 1
+            return make_movies([1]).nlargest(n, 'vote_average')
+
+    get_popular_movies.clear()
+    catalog = Catalog()
+    for version in ('v1', 'v2', 'v3', 'v3', 'v2'):
+        get_popular_movies(catalog, version)
+    assert Catalog.calls == 3
+
+    get_popular_movies(catalog, 'v1')
+    assert Catalog.calls == 4
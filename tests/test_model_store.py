@@ -0,0 +1,92 @@
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from catalog_ingest import ingest_catalog
+import model_store
+from model_store import ModelStore, publish_catalog_index
+
+@pytest.fixture
+def catalog(tmp_path, write_movies):
+    index_dir = str(tmp_path / 'index')
+    store_root = str(tmp_path / 'store')
+    ingest_catalog(write_movies(tmp_path / 'movies.csv', 300), None, index_dir, chunksize=100, n_features=2 ** 12)
+    return tmp_path, index_dir, store_root
+
+
+def test_reingest_does_not_touch_attached_version(catalog, write_movies):
+    tmp_path, index_dir, store_root = catalog
+    version = publish_catalog_index(index_dir, store_root)
+    store = ModelStore(store_root, check_interval=0)
+    model = store.current()
+    before = np.array(model.similar(250, 5)[0])
+
+    ingest_catalog(write_movies(tmp_path / 'small.csv', 50, seed=1), None, index_dir, chunksize=100, n_features=2 ** 12)
+
+    assert model.neighbors.shape == (300, 20)
+    assert np.array_equal(model.similar(250, 5)[0], before)
+    assert model.frame([250])['title'].iloc[0] == 'Movie 251'
+    assert store.current().version == version
+
+
+def test_publish_swaps_attached_workers_to_new_version(catalog, write_movies):
+    tmp_path, index_dir, store_root = catalog
+    publish_catalog_index(index_dir, store_root)
+    store = ModelStore(store_root, check_interval=0)
+    old_model = store.current()
+
+    ingest_catalog(write_movies(tmp_path / 'small.csv', 50, seed=1), None, index_dir, chunksize=100, n_features=2 ** 12)
+    new_version = publish_catalog_index(index_dir, store_root, keep=1)
+
+    new_model = store.current()
+    assert new_model.version == new_version
+    assert len(new_model) == 50
+    assert os.listdir(os.path.join(store_root, 'versions')) == [new_version]
+    # The pruned version stays readable for anyone still holding it
+    assert len(old_model) == 300
+    assert old_model.frame([299])['title'].iloc[0] == 'Movie 300'
+    assert old_model.similar(299, 3)[0].shape == (3,)
+
+
+def test_attach_follows_pointer_when_version_was_pruned(catalog, monkeypatch):
+    tmp_path, index_dir, store_root = catalog
+    latest = publish_catalog_index(index_dir, store_root)
+    store = ModelStore(store_root, check_interval=0)
+    pointers = iter(['20000101000000-pruned', latest])
+    monkeypatch.setattr(store, '_current_version', lambda: next(pointers))
+
+    assert store.current().version == latest
+
+
+def test_concurrent_sessions_attach_a_new_version_once(catalog, monkeypatch):
+    tmp_path, index_dir, store_root = catalog
+    publish_catalog_index(index_dir, store_root)
+    store = ModelStore(store_root, check_interval=0)
+    attached = []
+    original = model_store.SharedModel
+
+    def slow_attach(version_dir):
+        attached.append(version_dir)
+        threading.Event().wait(0.05)
+        return original(version_dir)
+
+    monkeypatch.setattr(model_store, 'SharedModel', slow_attach)
+    threads = [threading.Thread(target=store.current) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(attached) == 1
+
+
+def test_missing_pointer_is_logged_once(tmp_path, caplog):
+    store = ModelStore(str(tmp_path / 'empty'), check_interval=0)
+    with caplog.at_level(logging.WARNING, logger='model_store'):
+        for _ in range(5):
+            assert store.current() is None
+    assert len(caplog.records) == 1
@@ -0,0 +1,192 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from poster_fetcher import FailureTracker, PosterCache, PosterFetcher, PLACEHOLDER_POSTER, cache_key
+
+
+class StubTMDB:
+    """Local stand-in for the TMDB API: /movie/<id> answers by id, /search/movie by title."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.statuses = {}
+        self.headers = {}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests.append(self.path)
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    time.sleep(stub.delay)
+                    path = self.path.split('?', 1)[0]
+                    status = stub.statuses.get(path, 200)
+                    if path.startswith('/movie/') and status == 200:
+                        movie_id = int(path.rsplit('/', 1)[1])
+                        body = {'id': movie_id, 'poster_path': f'/{movie_id}.jpg'}
+                    elif path == '/search/movie' and status == 200:
+                        body = {'results': [{'id': 7, 'poster_path': '/search.jpg'}]}
+                    else:
+                        body = {'status_message': 'error'}
+                    data = json.dumps(body).encode()
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    for name, value in stub.headers.get(path, {}).items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(data)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def count(self, path):
+        return sum(1 for request in self.requests if request.split('?', 1)[0] == path)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubTMDB()
+    yield server
+    server.close()
+
+
+def make_fetcher(stub, tmp_path, **kwargs):
+    kwargs.setdefault('retries', 0)
+    kwargs.setdefault('requests_per_second', 0)
+    return PosterFetcher('test-key', cache=PosterCache(str(tmp_path / 'posters.sqlite3')),
+                         api_base=stub.base_url, image_base='http://images', **kwargs)
+
+
+def test_fetches_page_concurrently(stub, tmp_path):
+    stub.delay = 0.2
+    fetcher = make_fetcher(stub, tmp_path, max_workers=8)
+    movies = [(movie_id, f'Movie {movie_id}') for movie_id in range(1, 9)]
+
+    started = time.monotonic()
+    urls = fetcher.poster_urls(movies)
+    elapsed = time.monotonic() - started
+
+    assert urls == [f'http://images/{movie_id}.jpg' for movie_id in range(1, 9)]
+    assert stub.max_in_flight > 1
+    assert elapsed < 8 * stub.delay
+
+
+def test_hits_are_served_from_disk_cache(stub, tmp_path):
+    make_fetcher(stub, tmp_path).poster_urls([(1, 'One'), (None, 'Searched')])
+    seen = len(stub.requests)
+
+    urls = make_fetcher(stub, tmp_path).poster_urls([(1, 'One'), (None, 'Searched')])
+
+    assert urls == ['http://images/1.jpg', 'http://images/search.jpg']
+    assert len(stub.requests) == seen
+
+
+def test_not_found_is_negatively_cached(stub, tmp_path):
+    stub.statuses['/movie/404'] = 404
+    fetcher = make_fetcher(stub, tmp_path)
+
+    assert fetcher.poster_urls([(404, 'Missing')]) == [PLACEHOLDER_POSTER]
+    assert fetcher.poster_urls([(404, 'Missing')]) == [PLACEHOLDER_POSTER]
+    assert stub.count('/movie/404') == 1
+    assert fetcher.cache.get_many([cache_key(404)]) == {cache_key(404): None}
+
+
+def test_server_error_is_not_cached(stub, tmp_path):
+    stub.statuses['/movie/500'] = 500
+    fetcher = make_fetcher(stub, tmp_path, failures=FailureTracker(failure_ttl=0))
+
+    assert fetcher.poster_urls([(500, 'Broken')]) == [PLACEHOLDER_POSTER]
+    assert fetcher.cache.get_many([cache_key(500)]) == {}
+
+    del stub.statuses['/movie/500']
+    assert fetcher.poster_urls([(500, 'Broken')]) == ['http://images/500.jpg']
+    assert stub.count('/movie/500') == 2
+
+
+def test_recent_failures_are_skipped(stub, tmp_path):
+    stub.statuses['/movie/503'] = 503
+    fetcher = make_fetcher(stub, tmp_path, failures=FailureTracker(failure_ttl=60))
+
+    fetcher.poster_urls([(503, 'Down')])
+    fetcher.poster_urls([(503, 'Down')])
+
+    assert stub.count('/movie/503') == 1
+
+
+def test_breaker_skips_network_during_outage(stub, tmp_path):
+    for movie_id in range(1, 7):
+        stub.statuses[f'/movie/{movie_id}'] = 502
+    fetcher = make_fetcher(stub, tmp_path, max_workers=1,
+                           failures=FailureTracker(failure_ttl=0, threshold=3, cooldown=60))
+
+    fetcher.poster_urls([(movie_id, None) for movie_id in range(1, 4)])
+    seen = len(stub.requests)
+    fetcher.poster_urls([(movie_id, None) for movie_id in range(4, 7)])
+
+    assert seen == 3
+    assert len(stub.requests) == seen
+
+
+def test_rate_limit_does_not_sleep_out_retry_after(stub, tmp_path):
+    stub.statuses['/movie/429'] = 429
+    stub.headers['/movie/429'] = {'Retry-After': '30'}
+    fetcher = make_fetcher(stub, tmp_path, retries=1, max_retry_after=0.2,
+                           failures=FailureTracker(failure_ttl=0, threshold=100, cooldown=60))
+
+    started = time.monotonic()
+    assert fetcher.poster_urls([(429, 'Limited')]) == [PLACEHOLDER_POSTER]
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 2
+    assert stub.count('/movie/429') == 2
+    assert fetcher.cache.get_many([cache_key(429)]) == {}
+    # The 429 opens the breaker for the requested back-off, so the next page skips the network
+    assert fetcher.failures.is_open()
+    fetcher.poster_urls([(1, 'Other')])
+    assert stub.count('/movie/1') == 0
+
+
+def test_expired_rows_are_purged(tmp_path):
+    cache = PosterCache(str(tmp_path / 'posters.sqlite3'), ttl=-1, negative_ttl=-1, purge_interval=0)
+    cache.set_many({'id:1': {'poster_url': 'x'}, 'id:2': None})
+    cache.set_many({'id:3': None})
+
+    count = cache._conn.execute("SELECT COUNT(*) FROM posters").fetchone()[0]
+    assert count == 1
+
+
+def test_failure_tracker_forgets_expired_keys():
+    failures = FailureTracker(failure_ttl=0, threshold=100)
+    for key in range(50):
+        failures.record_failure(key)
+    assert len(failures._failed) == 1
+
+
+def test_missing_ids_fall_back_to_title():
+    pd = pytest.importorskip('pandas')
+    assert cache_key(pd.NA, 'Title') == 'title:title'
+    assert cache_key(float('nan'), None) is None
+    assert cache_key('12.0') == 'id:12'